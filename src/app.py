@@ -3,14 +3,14 @@ import gradio as gr
 from functools import cache
 from dotenv import load_dotenv
 from src.rag_llm import langchain_magic, INITIAL_MESSAGE
-from src.chunking import init_db
+from src.chunking import init_db, db_name
 
 
 @cache
 def get_conversation_chain():
     """Initialize once and cache the result"""
     vectorstore = init_db()
-    return langchain_magic(vectorstore)
+    return langchain_magic(vectorstore, db_name)
 
 
 def chat(question, history):
@@ -13,6 +13,7 @@ from langchain.text_splitter import CharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from src.website_scraper import scrape_website, scrape_github
+from src.routing import build_doc_type_index, ensure_doc_type_index
 from src.logger_init import logger
 
 
@@ -176,6 +177,7 @@ def init_db(folder_path="data", db_name=db_name):
         vectorstore = Chroma(
             persist_directory=db_name, embedding_function=embeddings
         )
+        ensure_doc_type_index(vectorstore, db_name)
     else:
         logger.info(
             "🛠 Changes detected or DB missing. Rebuilding vectorstore..."
@@ -187,6 +189,7 @@ def init_db(folder_path="data", db_name=db_name):
         os.makedirs(db_name, exist_ok=True)
         with open(hash_file, "w") as f:
             f.write(current_hash)
+        build_doc_type_index(vectorstore, db_name)
 
     logger.info(
         f"Vectorstore ready with {vectorstore._collection.count()} documents"
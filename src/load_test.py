@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+"""
+Load test for the multi-worker serving mode.
+
+Starts stub OpenAI-compatible embedding and chat servers in their own
+process, builds a synthetic vector_db with them and measures chat
+throughput for several worker counts. Every worker runs `threads` requests
+at once, so the network waits already overlap inside a single process:
+the 1 worker row is the one-process thread baseline, and any gain over it
+comes from spreading the CPU-bound work (embedding parsing, retrieval,
+prompt building, chain overhead) across cores.
+"""
+
+EMBEDDING_DIM = 1536
+DOC_TYPES = ["CV", "publications", "github", "courses", "education"]
+
+
+def stub_embedding(text):
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        if self.path.endswith("/embeddings"):
+            inputs = body["input"]
+            if isinstance(inputs, (str, int)) or (
+                inputs and isinstance(inputs[0], int)
+            ):
+                inputs = [inputs]
+            response = {
+                "object": "list",
+                "model": body.get("model", "stub"),
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": stub_embedding(json.dumps(text)),
+                    }
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        elif self.path.endswith("/chat/completions"):
+            question = body["messages"][-1]["content"][-200:]
+            response = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": f"Stub answer to: {question}",
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                },
+            }
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve_stub(latency, ports):
+    StubOpenAIHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_server(latency):
+    """Run the stubs in their own process so they don't compete for our GIL."""
+    ctx = multiprocessing.get_context("spawn")
+    ports = ctx.Queue()
+    process = ctx.Process(
+        target=_serve_stub, args=(latency, ports), daemon=True
+    )
+    process.start()
+    return process, ports.get(timeout=60)
+
+
+def build_stub_db(db_name, n_chunks):
+    from langchain.schema import Document
+    from langchain_openai import OpenAIEmbeddings
+    from langchain_chroma import Chroma
+    from src.routing import build_doc_type_index
+
+    vectorstore = Chroma(
+        persist_directory=db_name,
+        embedding_function=OpenAIEmbeddings(check_embedding_ctx_length=False),
+    )
+    docs = [
+        Document(
+            page_content=f"Synthetic chunk {i} about {DOC_TYPES[i % len(DOC_TYPES)]}. "
+            * 20,
+            metadata={"doc_type": DOC_TYPES[i % len(DOC_TYPES)]},
+        )
+        for i in range(n_chunks)
+    ]
+    for i in range(0, len(docs), 100):
+        vectorstore.add_documents(docs[i : i + 100])
+    build_doc_type_index(vectorstore, db_name)
+
+
+def run_load(pool, n_requests, concurrency):
+    # Unique questions: every request misses the cache and reaches a worker
+    questions = [
+        f"Question {i}: what publications and projects did he work on?"
+        for i in range(n_requests)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        answers = list(executor.map(pool.ask, questions))
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(a.startswith("Stub answer") for a in answers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure chat throughput against stub LLM/embedding servers"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Concurrent requests per worker"
+    )
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Stub response delay (s)"
+    )
+    args = parser.parse_args()
+
+    stub, port = start_stub_server(args.latency)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    # Inherited by the spawned workers
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    from src.serving import WorkerPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "vector_db")
+        build_stub_db(db_name, args.chunks)
+
+        print(
+            f"{'workers':>8} {'threads':>8} {'requests':>9} {'seconds':>8} {'req/s':>8}"
+        )
+        for workers in args.workers:
+            pool = WorkerPool(
+                db_name=db_name,
+                workers=workers,
+                threads=args.threads,
+                max_pending=args.concurrency,
+                cache_size=0,
+            )
+            pool.warm_up()
+            elapsed, ok = run_load(pool, args.requests, args.concurrency)
+            pool.shutdown()
+            print(
+                f"{workers:>8} {args.threads:>8} {ok:>9} {elapsed:>8.2f} {ok / elapsed:>8.1f}"
+            )
+
+    stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
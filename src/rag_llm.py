@@ -3,6 +3,8 @@ from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain.schema import AIMessage
+from src.routing import RoutedRetriever, load_doc_type_index
+from src.logger_init import logger
 
 MODEL = "gpt-5-mini"  # "gpt-4o-mini"
 INITIAL_MESSAGE = """Hello! I'm an AI assistant specialized in providing information about Jose Agustin BARRACHINA. I have access to detailed information about his background, projects, skills, and experience. 
@@ -10,7 +12,7 @@ INITIAL_MESSAGE = """Hello! I'm an AI assistant specialized in providing informa
 How can I help you learn more about him today?"""
 
 
-def langchain_magic(vectorstore):
+def langchain_magic(vectorstore, db_name, with_memory=True):
     llm = ChatOpenAI(temperature=0.7, model_name=MODEL)
 
     system_prompt = """You are an AI assistant specialized in providing information about Jose Agustin BARRACHINA (also known as Agustin, NEGU, or Jose). All pronouns ("he", "him") refer to him.
@@ -53,15 +55,27 @@ Answer:"""
     )
 
     # set up the conversation memory for the chat
-    memory = ConversationBufferMemory(
-        memory_key="chat_history", return_messages=True
+    # (without it, the caller passes the chat_history with every question)
+    memory = None
+    if with_memory:
+        memory = ConversationBufferMemory(
+            memory_key="chat_history", return_messages=True
+        )
+        initial_message = AIMessage(content=INITIAL_MESSAGE)
+
+        memory.chat_memory.add_message(initial_message)
+
+    # the retriever routes each question to the relevant doc_types (CV, publications, ...)
+    # and falls back to searching the whole VectorStore when the routing is unsure
+    doc_type_counts = load_doc_type_index(vectorstore, db_name)
+    if doc_type_counts is None:
+        logger.warning("No up to date doc type index, routing disabled")
+        doc_type_counts = {}
+    retriever = RoutedRetriever(
+        vectorstore=vectorstore,
+        doc_type_counts=doc_type_counts,
+        k=10,
     )
-    initial_message = AIMessage(content=INITIAL_MESSAGE)
-
-    memory.chat_memory.add_message(initial_message)
-
-    # the retriever is an abstraction over the VectorStore that will be used during RAG
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
 
     # putting it together: set up the conversation chain with the GPT 3.5 LLM, the vector store and memory
     conversation_chain = ConversationalRetrievalChain.from_llm(
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+from typing import Any
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.logger_init import logger
+
+
+INDEX_FILE = "doc_type_index.json"
+PAGE_SIZE = 1000
+
+# Keyword stems per doc_type (folder names under data/). Kept deliberately
+# cheap: a question is routed only when these clearly point at a partition.
+# A stem also matches its usual inflections (publish -> published, publishes).
+DOC_TYPE_KEYWORDS = {
+    "CV": [
+        "cv",
+        "resume",
+        "résumé",
+        "curriculum",
+        "experience",
+        "job",
+        "career",
+        "position",
+        "skill",
+        "employ",
+        "employment",
+        "internship",
+    ],
+    "certificates": [
+        "certificate",
+        "certified",
+        "certification",
+        "membership",
+    ],
+    "comptetitions": [
+        "competition",
+        "contest",
+        "ieeextreme",
+        "xtreme",
+        "hackathon",
+        "ranking",
+    ],
+    "courses": ["course", "coursera", "mooc"],
+    "education": [
+        "education",
+        "degree",
+        "university",
+        "universities",
+        "phd",
+        "bachelor",
+        "diploma",
+        "transcript",
+        "grade",
+        "polytechnique",
+        "saclay",
+    ],
+    "events_conferences": [
+        "conference",
+        "workshop",
+        "summer school",
+    ],
+    "github": [
+        "github",
+        "repo",
+        "repository",
+        "repositories",
+        "library",
+        "libraries",
+        "open source",
+    ],
+    "languages": ["delf", "tcf", "toeic", "bilingual", "fluent"],
+    "publications": [
+        "paper",
+        "publish",
+        "publication",
+        "article",
+        "journal",
+        "arxiv",
+        "cvnn",
+        "polsar",
+    ],
+    "website": ["website", "timeline", "phd", "thesis"],
+}
+
+# Words that hint at a doc_type but often mean something else
+# ("programming languages", "training data"): too weak to route on alone
+WEAK_KEYWORDS = {
+    "CV": ["work", "role"],
+    "certificates": ["member"],
+    "courses": ["training"],
+    "education": ["study", "studied", "master"],
+    "events_conferences": ["event", "attend"],
+    "github": ["code", "project"],
+    "languages": ["language", "speak", "french", "english", "spanish"],
+    "publications": ["research"],
+}
+WEAK_WEIGHT = 0.5
+# Score a doc_type needs before the question is routed to it
+MIN_SCORE = 1.0
+# Phrases whose words must not count towards any doc_type
+IGNORED_PHRASES = [
+    "programming language",
+    "training data",
+    "training set",
+]
+
+_SUFFIXES = r"(?:s|es|ed|ing|er|ers|ion|ions)?"
+
+
+def _paged_metadatas(collection, page_size=PAGE_SIZE):
+    """Yield metadata rows from a Chroma collection, one page at a time."""
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        result = collection.get(
+            include=["metadatas"], limit=page_size, offset=offset
+        )
+        yield from result["metadatas"]
+
+
+def build_doc_type_index(vectorstore, db_name):
+    """Count chunks per doc_type and persist the result next to the DB."""
+    counts = {}
+    for metadata in _paged_metadatas(vectorstore._collection):
+        doc_type = (metadata or {}).get("doc_type")
+        if doc_type:
+            counts[doc_type] = counts.get(doc_type, 0) + 1
+
+    os.makedirs(db_name, exist_ok=True)
+    with open(os.path.join(db_name, INDEX_FILE), "w") as f:
+        json.dump(
+            {
+                "collection_size": vectorstore._collection.count(),
+                "counts": counts,
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    logger.info(f"Doc type index built: {counts}")
+    return counts
+
+
+def load_doc_type_index(vectorstore, db_name):
+    """
+    Read the persisted doc_type index. Never writes: returns None when the
+    index is missing or stale (see ensure_doc_type_index).
+    """
+    index_file = os.path.join(db_name, INDEX_FILE)
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, "r") as f:
+        index = json.load(f)
+    if index.get("collection_size") != vectorstore._collection.count():
+        return None
+    return index["counts"]
+
+
+def ensure_doc_type_index(vectorstore, db_name):
+    """Load the doc_type index, rebuilding it if missing or stale."""
+    counts = load_doc_type_index(vectorstore, db_name)
+    if counts is None:
+        logger.info("Doc type index missing or stale. Rebuilding...")
+        counts = build_doc_type_index(vectorstore, db_name)
+    return counts
+
+
+def _keyword_score(doc_type, text):
+    """
+    Weighted keyword score of one doc_type. Each word of the question
+    counts once, with the weight of the strongest keyword matching it.
+    """
+    weights = {}
+    for keywords, weight in (
+        (DOC_TYPE_KEYWORDS.get(doc_type, []), 1.0),
+        (WEAK_KEYWORDS.get(doc_type, []), WEAK_WEIGHT),
+    ):
+        for keyword in keywords:
+            pattern = rf"\b{re.escape(keyword)}{_SUFFIXES}\b"
+            for match in re.finditer(pattern, text):
+                start = match.start()
+                weights[start] = max(weights.get(start, 0.0), weight)
+    return sum(weights.values())
+
+
+def classify_question(question, doc_types=DOC_TYPE_KEYWORDS.keys()):
+    """
+    Score each doc_type by (weighted) keyword hits in the question.
+    Returns every doc_type tied for the best score and a confidence in
+    [0, 1]: the margin of that score over the runner-up, scaled down when
+    the best score is below MIN_SCORE.
+    """
+    text = question.lower()
+    for phrase in IGNORED_PHRASES:
+        text = re.sub(rf"\b{re.escape(phrase)}{_SUFFIXES}\b", " ", text)
+    scores = {}
+    for doc_type in doc_types:
+        score = _keyword_score(doc_type, text)
+        if score:
+            scores[doc_type] = score
+
+    if not scores:
+        return [], 0.0
+
+    top = max(scores.values())
+    selected = [t for t in scores if scores[t] == top]
+    runner_up = max(
+        (score for score in scores.values() if score < top), default=0.0
+    )
+    confidence = (top - runner_up) / top * min(1.0, top / MIN_SCORE)
+    return selected, confidence
+
+
+class RoutedRetriever(BaseRetriever):
+    """
+    Retriever that restricts the similarity search to the doc_types a
+    question is about, falling back to a global search when the router
+    is not confident or the routed partitions are too small. Routed
+    results are always merged with a small global top-k, so a wrong route
+    cannot hide the chunks that actually answer the question.
+    """
+
+    vectorstore: Any
+    doc_type_counts: dict
+    k: int = 10
+    global_k: int = 3
+    min_confidence: float = 0.6
+
+    def route(self, query):
+        doc_types, confidence = classify_question(
+            query, self.doc_type_counts.keys()
+        )
+        doc_types = [t for t in doc_types if self.doc_type_counts.get(t)]
+        if not doc_types or confidence < self.min_confidence:
+            return None
+        # Not enough chunks to fill k: filtering would only starve the prompt
+        if sum(self.doc_type_counts[t] for t in doc_types) < self.k:
+            return None
+        if len(doc_types) == 1:
+            return {"doc_type": doc_types[0]}
+        return {"doc_type": {"$in": doc_types}}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        where = self.route(query)
+        if where is None:
+            logger.debug(f"Global search for: {query}")
+            return self.vectorstore.similarity_search(query, k=self.k)
+        logger.debug(f"Routed search {where} for: {query}")
+        routed = self.vectorstore.similarity_search(
+            query, k=self.k, filter=where
+        )
+        seen = {_doc_key(doc) for doc in routed}
+        extra = [
+            doc
+            for doc in self.vectorstore.similarity_search(
+                query, k=self.global_k
+            )
+            if _doc_key(doc) not in seen
+        ]
+        return routed[: self.k - len(extra)] + extra
+
+
+def _doc_key(doc):
+    return doc.id or (doc.page_content, tuple(sorted(doc.metadata.items())))
@@ -0,0 +1,454 @@
+import os
+import time
+import hashlib
+import argparse
+import itertools
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from multiprocessing.connection import wait
+from src.logger_init import logger
+
+
+"""
+Multi-worker serving mode.
+
+The parent process owns the request backlog, the answer cache and the
+backpressure. Each worker process opens the same persisted vector_db
+read-only and keeps its own conversation chain (without memory: the chat
+history travels with every request, so any worker can answer any turn).
+Every worker runs several requests at once on threads, so the LLM and
+embedding network waits overlap inside a process while the CPU-bound
+work (retrieval, prompt building, parsing) spreads across processes.
+Each worker talks to the parent over its own pipe: nothing is shared
+between workers, so one dying (OOM, segfault, kill) cannot wedge the others.
+"""
+
+BUSY_MESSAGE = "⚠️ The server is busy right now, please try again in a moment."
+TIMEOUT_MESSAGE = "⚠️ The answer took too long, please try again."
+
+# Per worker process state, set by _init_worker
+_chain = None
+
+
+def _init_worker(db_name):
+    global _chain
+    from langchain_openai import OpenAIEmbeddings
+    from langchain_chroma import Chroma
+    from src.rag_llm import langchain_magic
+
+    # Questions are short: skip the tiktoken length check (and its download)
+    vectorstore = Chroma(
+        persist_directory=db_name,
+        embedding_function=OpenAIEmbeddings(check_embedding_ctx_length=False),
+    )
+    _chain = langchain_magic(vectorstore, db_name, with_memory=False)
+    logger.info(f"Worker {os.getpid()} ready")
+
+
+def _to_messages(history):
+    from langchain.schema import AIMessage, HumanMessage
+
+    messages = []
+    for message in history or []:
+        content = message["content"]
+        if not isinstance(content, str):
+            continue  # files and components are not part of the RAG context
+        if message["role"] == "user":
+            messages.append(HumanMessage(content=content))
+        else:
+            messages.append(AIMessage(content=content))
+    return messages
+
+
+def _answer(question, history):
+    result = _chain.invoke(
+        {"question": question, "chat_history": _to_messages(history)}
+    )
+    return result["answer"]
+
+
+def _handle(request, send):
+    request_id, question, history = request
+    try:
+        send(("answer", request_id, _answer(question, history)))
+    except Exception as e:
+        send(("error", request_id, f"{type(e).__name__}: {e}"))
+
+
+def _worker_main(db_name, threads, conn):
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    try:
+        _init_worker(db_name)
+    except Exception as e:
+        send(("failed", None, f"{type(e).__name__}: {e}"))
+        return
+    send(("ready", None, None))
+
+    # The parent never sends more than `threads` requests at once
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break  # the parent is gone
+            if request is None:
+                break
+            executor.submit(_handle, request, send)
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of answers, shared by every worker."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question, history):
+        h = hashlib.md5(question.strip().lower().encode())
+        for message in history or []:
+            h.update(f"{message['role']}:{message['content']}".encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, answer):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._data[key] = answer
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.inflight = set()
+        self.ready = False
+
+
+class WorkerPool:
+    """
+    Pool of chat worker processes sharing one persisted vector store, each
+    running up to `threads` requests concurrently.
+    At most max_pending requests are queued or running at once; anything
+    beyond that is rejected straight away instead of piling up.
+    Dead workers are replaced and the requests they held are failed.
+    """
+
+    def __init__(
+        self,
+        db_name="vector_db",
+        workers=None,
+        threads=8,
+        max_pending=None,
+        cache_size=1024,
+        timeout=120,
+    ):
+        self.workers = workers or os.cpu_count()
+        self.threads = threads
+        self.max_pending = max_pending or 2 * self.workers * self.threads
+        self.timeout = timeout
+        self.cache = AnswerCache(cache_size)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._backlog = deque()
+        self._futures = {}
+        self._deadlines = {}
+        self._ids = itertools.count()
+        self._ready = threading.Semaphore(0)
+        self._startup_error = None
+        self._closing = False
+
+        # spawn: workers must not inherit the parent's threads (Gradio, Chroma)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._db_name = db_name
+        self._workers = [self._start_worker() for _ in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _start_worker(self):
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._db_name, self.threads, child_conn),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, conn)
+
+    def _pop_future(self, request_id):
+        with self._lock:
+            self._deadlines.pop(request_id, None)
+            return self._futures.pop(request_id, None)
+
+    def _collect(self):
+        """
+        Hand the workers' results back to the waiting futures, watch the
+        workers' processes and feed them from the backlog.
+        """
+        while not self._closing:
+            with self._lock:
+                alive = [w for w in self._workers if w is not None]
+            conns = {w.conn: w for w in alive}
+            sentinels = {w.process.sentinel: w for w in alive}
+            for ready in wait([*conns, *sentinels], timeout=1.0):
+                if ready in conns:
+                    try:
+                        self._handle_message(conns[ready], ready.recv())
+                    except (EOFError, OSError):
+                        self._worker_died(conns[ready])
+                else:
+                    self._worker_died(sentinels[ready])
+            self._expire_backlog()
+            self._dispatch()
+
+    def _handle_message(self, worker, message):
+        kind, request_id, payload = message
+        if kind == "ready":
+            worker.ready = True
+            self._ready.release()
+            return
+        if kind == "failed":
+            logger.error(
+                f"Worker {worker.process.pid} failed to start: {payload}"
+            )
+            self._startup_error = payload
+            self._ready.release()  # wake up warm_up
+            return
+        with self._lock:
+            worker.inflight.discard(request_id)
+        future = self._pop_future(request_id)
+        if future is None:
+            return
+        if kind == "answer":
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _worker_died(self, worker):
+        with self._lock:
+            if worker not in self._workers:
+                return  # already handled
+            index = self._workers.index(worker)
+            self._workers[index] = None
+
+        # Answers it sent before dying are still in the pipe
+        try:
+            while worker.conn.poll():
+                self._handle_message(worker, worker.conn.recv())
+        except (EOFError, OSError):
+            pass
+        worker.conn.close()
+        worker.process.join(timeout=1)
+
+        with self._lock:
+            lost, worker.inflight = worker.inflight, set()
+        for request_id in lost:
+            future = self._pop_future(request_id)
+            if future is not None:
+                future.set_exception(RuntimeError("The worker answering died"))
+
+        if self._closing:
+            return
+        if not worker.ready:
+            # Failed during start up: restarting would fail the same way
+            return
+        logger.error(
+            f"Worker {worker.process.pid} died (exit code "
+            f"{worker.process.exitcode}), {len(lost)} requests lost. "
+            "Restarting it..."
+        )
+        replacement = self._start_worker()
+        with self._lock:
+            self._workers[index] = replacement
+
+    def _expire_backlog(self):
+        """Drop queued requests whose caller already gave up."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                request
+                for request in self._backlog
+                if now > self._deadlines.get(request[0], 0)
+            ]
+            for request in expired:
+                self._backlog.remove(request)
+        for request in expired:
+            future = self._pop_future(request[0])
+            if future is not None:
+                future.set_exception(TimeoutError())
+
+    def _dispatch(self):
+        """Send queued requests to the least busy workers with a free thread."""
+        with self._lock:
+            while self._backlog:
+                free = [
+                    w
+                    for w in self._workers
+                    if w is not None
+                    and w.ready
+                    and len(w.inflight) < self.threads
+                ]
+                if not free:
+                    break
+                worker = min(free, key=lambda w: len(w.inflight))
+                request = self._backlog.popleft()
+                try:
+                    worker.conn.send(request)
+                except OSError:
+                    # Dying worker: the collector will notice and replace it
+                    self._backlog.appendleft(request)
+                    break
+                worker.inflight.add(request[0])
+
+    def warm_up(self, timeout=300):
+        """Wait until every worker has loaded its chain."""
+        for _ in range(self.workers):
+            if not self._ready.acquire(timeout=timeout):
+                raise RuntimeError("Workers did not start in time")
+            if self._startup_error:
+                raise RuntimeError(
+                    f"Worker failed to start: {self._startup_error}"
+                )
+        logger.info(
+            f"✅ {self.workers} workers started ({self.threads} threads each)"
+        )
+
+    def ask(self, question, history=None):
+        key = self.cache.key(question, history)
+        answer = self.cache.get(key)
+        if answer is not None:
+            return answer
+
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Request rejected: queue is full")
+            return BUSY_MESSAGE
+
+        request_id = next(self._ids)
+        future = Future()
+        # The slot is held until the request leaves the pool for good
+        # (answered, failed, or dropped from the backlog after its
+        # deadline), not just until we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures[request_id] = future
+            self._deadlines[request_id] = time.time() + self.timeout
+            self._backlog.append((request_id, question, history))
+        self._dispatch()
+
+        try:
+            answer = future.result(timeout=self.timeout)
+        except TimeoutError:
+            logger.warning(f"Request timed out after {self.timeout}s")
+            return TIMEOUT_MESSAGE
+
+        self.cache.put(key, answer)
+        return answer
+
+    def shutdown(self):
+        self._closing = True
+        self._collector.join()
+        with self._lock:
+            workers = [w for w in self._workers if w is not None]
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout=30)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        with self._lock:
+            futures, self._futures = self._futures, {}
+            self._deadlines, self._backlog = {}, deque()
+        for future in futures.values():
+            future.set_exception(RuntimeError("Worker pool shut down"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the chat with several worker processes"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Concurrent requests per worker"
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=None,
+        help="Requests queued or running before new ones are rejected",
+    )
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=7860)
+    args = parser.parse_args()
+
+    import gradio as gr
+    from dotenv import load_dotenv
+    from src.chunking import init_db, db_name
+    from src.rag_llm import INITIAL_MESSAGE
+
+    load_dotenv(override=True)
+
+    # Build (or check) the store and its doc_type index once, in the parent,
+    # so the workers only ever read them
+    init_db()
+
+    pool = WorkerPool(
+        db_name=db_name,
+        workers=args.workers,
+        threads=args.threads,
+        max_pending=args.max_pending,
+        cache_size=args.cache_size,
+    )
+    pool.warm_up()
+
+    def chat(question, history):
+        try:
+            return pool.ask(question, history)
+        except Exception as e:
+            return f"⚠️ Error: {e}"
+
+    initial_history = [{"role": "assistant", "content": INITIAL_MESSAGE}]
+
+    chat_interface = gr.ChatInterface(
+        chat,
+        type="messages",
+        chatbot=gr.Chatbot(
+            value=initial_history, type="messages", height="70vh"
+        ),
+        title="🤖 AI Expert on Jose Agustin BARRACHINA Assistant powered by RAG",
+        fill_height=False,
+        concurrency_limit=pool.max_pending,
+    )
+    chat_interface.queue(max_size=pool.max_pending * 4)
+    try:
+        chat_interface.launch(
+            server_name="0.0.0.0", server_port=args.port, show_error=True
+        )
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,295 @@
+import os
+import argparse
+import hashlib
 import numpy as np
-from sklearn.manifold import TSNE
 import plotly.graph_objects as go
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.manifold import TSNE
+from src.logger_init import logger
 
 
-def tsne_visualizer(collection):
-    result = collection.get(include=["embeddings", "documents", "metadatas"])
-    vectors = np.array(result["embeddings"])
-    documents = result["documents"]
-    metadatas = result["metadatas"]
-    doc_types = set([metadata["doc_type"] for metadata in metadatas])
-    print(
-        f"Visualizing {len(vectors)} vectors with {len(doc_types)} document types"
-    )
-    tsne = TSNE(n_components=2, random_state=42)
-    reduced_vectors = tsne.fit_transform(vectors)
-
-    # Create the 2D scatter plot
-    fig = go.Figure(
-        data=[
-            go.Scatter(
-                x=reduced_vectors[:, 0],
-                y=reduced_vectors[:, 1],
+PAGE_SIZE = 1000
+METHODS = ("ipca", "pca", "tsne")
+# TSNE is quadratic-ish in the number of points: above this it gets sampled
+TSNE_MAX_POINTS = 5000
+
+
+def iter_pages(collection, include, page_size=None):
+    """Yield (offset, result) pages from a Chroma collection."""
+    page_size = page_size or PAGE_SIZE
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        yield offset, collection.get(
+            include=include, limit=page_size, offset=offset
+        )
+
+
+def sample_offsets(total, sample, seed=42):
+    """Sorted offsets of the rows to keep, or None to keep them all."""
+    if not sample or sample >= total:
+        return None
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(total, size=sample, replace=False))
+
+
+def _keep_mask(offset, n_rows, offsets):
+    if offsets is None:
+        return np.ones(n_rows, dtype=bool)
+    return np.isin(np.arange(offset, offset + n_rows), offsets)
+
+
+def load_points(collection, offsets=None, with_embeddings=True):
+    """
+    Page embeddings (float32), doc_types and hover texts out of the store,
+    keeping only the rows listed in offsets.
+    """
+    include = ["documents", "metadatas"]
+    if with_embeddings:
+        include.append("embeddings")
+
+    vectors, doc_types, texts = [], [], []
+    for offset, page in iter_pages(collection, include):
+        keep = _keep_mask(offset, len(page["ids"]), offsets)
+        if with_embeddings:
+            vectors.append(
+                np.asarray(page["embeddings"], dtype=np.float32)[keep]
+            )
+        for i in np.flatnonzero(keep):
+            metadata = page["metadatas"][i] or {}
+            doc_type = metadata.get("doc_type", "unknown")
+            doc_types.append(doc_type)
+            texts.append(
+                f"Type: {doc_type}<br>Text: {(page['documents'][i] or '')[:100]}..."
+            )
+
+    vectors = np.concatenate(vectors) if vectors else None
+    return vectors, np.array(doc_types), np.array(texts)
+
+
+def incremental_projection(collection, offsets=None, n_components=2):
+    """
+    Fit an IncrementalPCA page by page, then project in a second pass.
+    Only one page of embeddings is held in memory at a time.
+    """
+    ipca = IncrementalPCA(n_components=n_components)
+    pending = None
+    for offset, page in iter_pages(collection, ["embeddings"]):
+        keep = _keep_mask(offset, len(page["ids"]), offsets)
+        batch = np.asarray(page["embeddings"], dtype=np.float32)[keep]
+        # partial_fit needs at least n_components rows per call
+        if pending is not None:
+            batch = np.concatenate([pending, batch])
+            pending = None
+        if len(batch) < n_components:
+            pending = batch
+            continue
+        ipca.partial_fit(batch)
+    # A trailing remainder smaller than n_components is left out of the fit
+    if not hasattr(ipca, "components_"):
+        raise ValueError(f"Need at least {n_components} points to project")
+
+    projected = []
+    for offset, page in iter_pages(collection, ["embeddings"]):
+        keep = _keep_mask(offset, len(page["ids"]), offsets)
+        batch = np.asarray(page["embeddings"], dtype=np.float32)[keep]
+        if len(batch):
+            projected.append(ipca.transform(batch))
+    return np.concatenate(projected)
+
+
+def project(vectors, method="pca", seed=42):
+    """Project an in-memory embedding matrix to 2D."""
+    if method == "pca":
+        return PCA(
+            n_components=2, svd_solver="randomized", random_state=seed
+        ).fit_transform(vectors)
+    if method == "tsne":
+        # Reduce to 50 dims first, TSNE is much faster on dense low-dim input
+        if vectors.shape[1] > 50 and len(vectors) > 50:
+            vectors = PCA(
+                n_components=50, svd_solver="randomized", random_state=seed
+            ).fit_transform(vectors)
+        return TSNE(
+            n_components=2, init="pca", random_state=seed
+        ).fit_transform(vectors)
+    raise ValueError(f"Unknown projection method: {method}")
+
+
+def index_version(collection, db_name=None):
+    """
+    Identify the current state of the index: the data hash written by
+    init_db when available, otherwise the ids stored in the collection,
+    plus the collection size.
+    """
+    version = hashlib.md5(str(collection.count()).encode())
+    hash_file = os.path.join(db_name, ".data_hash") if db_name else None
+    if hash_file and os.path.exists(hash_file):
+        with open(hash_file, "r") as f:
+            version.update(f.read().strip().encode())
+    else:
+        for _, page in iter_pages(collection, include=[]):
+            for id_ in page["ids"]:
+                version.update(id_.encode())
+    return version.hexdigest()[:12]
+
+
+def prune_cache(cache_dir, version):
+    """Remove projections cached for other versions of the index."""
+    for name in os.listdir(cache_dir):
+        if name.endswith(".npz") and not name.endswith(f"_{version}.npz"):
+            os.remove(os.path.join(cache_dir, name))
+            logger.debug(f"Removed stale projection {name}")
+
+
+def compute_projection(
+    collection, method="ipca", sample=None, seed=42, db_name=None
+):
+    """
+    Return (coords, doc_types, texts) for the collection. When db_name is
+    given, projections are cached under db_name/projections per index version.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+
+    total = collection.count()
+    if not total:
+        raise ValueError("The collection is empty, nothing to visualize")
+    if method == "tsne" and (not sample or sample > TSNE_MAX_POINTS):
+        if total > TSNE_MAX_POINTS:
+            logger.warning(
+                f"TSNE on {total} points is too slow, sampling {TSNE_MAX_POINTS}"
+            )
+            sample = TSNE_MAX_POINTS
+
+    cache_file = None
+    if db_name:
+        cache_dir = os.path.join(db_name, "projections")
+        version = index_version(collection, db_name)
+        cache_file = os.path.join(
+            cache_dir, f"{method}_{sample or 'all'}_{seed}_{version}.npz"
+        )
+        if os.path.exists(cache_file):
+            logger.info(f"✅ Loading cached projection {cache_file}")
+            cached = np.load(cache_file)
+            return cached["coords"], cached["doc_types"], cached["texts"]
+
+    offsets = sample_offsets(total, sample, seed)
+    if method == "ipca":
+        _, doc_types, texts = load_points(
+            collection, offsets, with_embeddings=False
+        )
+        coords = incremental_projection(collection, offsets)
+    else:
+        vectors, doc_types, texts = load_points(collection, offsets)
+        coords = project(vectors, method, seed)
+
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        prune_cache(cache_dir, version)
+        np.savez_compressed(
+            cache_file, coords=coords, doc_types=doc_types, texts=texts
+        )
+        logger.info(f"Projection cached to {cache_file}")
+    return coords, doc_types, texts
+
+
+def make_figure(coords, doc_types, texts, title):
+    """One WebGL trace per doc_type so points are colored and toggleable."""
+    fig = go.Figure()
+    for doc_type in np.unique(doc_types):
+        mask = doc_types == doc_type
+        fig.add_trace(
+            go.Scattergl(
+                x=coords[mask, 0],
+                y=coords[mask, 1],
                 mode="markers",
-                marker=dict(size=5, opacity=0.8),
-                text=[
-                    f"Type: {t}<br>Text: {d[:100]}..."
-                    for t, d in zip(doc_types, documents)
-                ],
+                name=f"{doc_type} ({mask.sum()})",
+                marker=dict(size=4 if len(coords) > 10000 else 5, opacity=0.7),
+                text=texts[mask],
                 hoverinfo="text",
             )
-        ]
-    )
+        )
 
     fig.update_layout(
-        title="2D Chroma Vector Store Visualization",
-        scene=dict(xaxis_title="x", yaxis_title="y"),
-        width=800,
-        height=600,
+        title=title,
+        xaxis_title="x",
+        yaxis_title="y",
+        width=1000,
+        height=700,
         margin=dict(r=20, b=10, l=10, t=40),
     )
+    return fig
+
+
+def visualize(
+    collection,
+    method="ipca",
+    sample=None,
+    seed=42,
+    db_name=None,
+    output=None,
+):
+    coords, doc_types, texts = compute_projection(
+        collection, method, sample, seed, db_name
+    )
+    logger.info(
+        f"Visualizing {len(coords)} vectors with {len(set(doc_types))} document types"
+    )
+    fig = make_figure(
+        coords,
+        doc_types,
+        texts,
+        f"2D Chroma Vector Store Visualization ({method.upper()})",
+    )
+    if output:
+        fig.write_html(output, include_plotlyjs="cdn")
+        logger.info(f"✅ Saved visualization to {output}")
+    else:
+        fig.show()
+    return fig
+
+
+def tsne_visualizer(collection):
+    return visualize(collection, method="tsne")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Visualize the embeddings of a persisted vector_db"
+    )
+    parser.add_argument("--db", default="vector_db", help="Chroma directory")
+    parser.add_argument("--method", choices=METHODS, default="ipca")
+    parser.add_argument(
+        "--sample", type=int, default=None, help="Plot a random subset"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Recompute the projection"
+    )
+    parser.add_argument(
+        "--output", default=None, help="Write HTML instead of opening it"
+    )
+    args = parser.parse_args()
+
+    # Chroma would silently create an empty store at a missing path
+    if not os.path.isdir(args.db):
+        parser.error(f"No vector store found at '{args.db}'")
+
+    from langchain_chroma import Chroma
+
+    # Embeddings are read from the store, no embedding function needed
+    collection = Chroma(persist_directory=args.db)._collection
+    if not collection.count():
+        parser.error(f"The vector store at '{args.db}' is empty")
+    visualize(
+        collection,
+        method=args.method,
+        sample=args.sample,
+        seed=args.seed,
+        db_name=None if args.no_cache else args.db,
+        output=args.output,
+    )
+
 
-    fig.show()
+if __name__ == "__main__":
+    main()
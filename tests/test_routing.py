@@ -0,0 +1,190 @@
+from langchain_core.documents import Document
+from src.routing import (
+    RoutedRetriever,
+    build_doc_type_index,
+    classify_question,
+    ensure_doc_type_index,
+    load_doc_type_index,
+)
+
+
+COUNTS = {
+    "CV": 40,
+    "education": 60,
+    "github": 120,
+    "languages": 3,
+    "publications": 300,
+    "website": 20,
+}
+
+
+def make_retriever(**kwargs):
+    return RoutedRetriever(vectorstore=None, doc_type_counts=COUNTS, **kwargs)
+
+
+def test_classify_no_keywords():
+    assert classify_question("Hello there!") == ([], 0.0)
+
+
+def test_classify_single_strong_match():
+    doc_types, confidence = classify_question("Which papers did he publish?")
+    assert doc_types == ["publications"]
+    assert confidence == 1.0
+
+
+def test_classify_matches_inflections():
+    assert classify_question("Where does he usually publishes?") == (
+        ["publications"],
+        1.0,
+    )
+    assert classify_question("Which certifications does he hold?") == (
+        ["certificates"],
+        1.0,
+    )
+
+
+def test_classify_keeps_ties():
+    doc_types, _ = classify_question("What did he publish during his PhD?")
+    assert set(doc_types) == {"education", "publications", "website"}
+
+
+def test_classify_generic_word_is_not_confident():
+    for question in ["What does he work on?", "Has he worked with PyTorch?"]:
+        doc_types, confidence = classify_question(question)
+        assert doc_types == ["CV"]
+        assert confidence < 0.6
+
+
+def test_classify_ambiguous_words_are_not_confident():
+    for question in [
+        "What programming languages does he know?",
+        "What French institutions did he attend?",
+        "How much training data did he use?",
+        "Is he a master of deep learning?",
+    ]:
+        _, confidence = classify_question(question)
+        assert confidence < 0.6, question
+
+
+def test_classify_weak_words_add_up():
+    assert classify_question("Does he speak French?") == (["languages"], 1.0)
+
+
+def test_classify_small_margin_is_not_confident():
+    _, confidence = classify_question(
+        "What projects did he do during his PhD?"
+    )
+    assert confidence < 0.6
+
+
+def test_classify_restricted_doc_types():
+    doc_types, _ = classify_question(
+        "Which papers did he publish?", doc_types=["CV", "github"]
+    )
+    assert doc_types == []
+
+
+def test_route_single_doc_type():
+    assert make_retriever().route("Which papers did he publish?") == {
+        "doc_type": "publications"
+    }
+
+
+def test_route_several_doc_types():
+    where = make_retriever().route("What did he publish during his PhD?")
+    assert set(where["doc_type"]["$in"]) == {
+        "education",
+        "publications",
+        "website",
+    }
+
+
+def test_route_falls_back_when_unsure():
+    retriever = make_retriever()
+    assert retriever.route("What does he work on?") is None
+    assert retriever.route("What programming languages does he know?") is None
+    assert retriever.route("What projects did he do during his PhD?") is None
+    assert retriever.route("Hello there!") is None
+
+
+def test_route_falls_back_on_small_partitions():
+    assert make_retriever(k=10).route("What languages does he speak?") is None
+    assert make_retriever(k=3).route("What languages does he speak?") == {
+        "doc_type": "languages"
+    }
+
+
+def test_route_ignores_missing_doc_types():
+    assert make_retriever().route("Which courses did he take?") is None
+
+
+class FakeVectorStore:
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = []
+
+    def similarity_search(self, query, k, filter=None):
+        self.calls.append(filter)
+        docs = self.docs
+        if filter is not None:
+            doc_type = filter["doc_type"]
+            docs = [d for d in docs if d.metadata["doc_type"] == doc_type]
+        return docs[:k]
+
+
+def test_routed_search_is_merged_with_global_results():
+    docs = [
+        Document(page_content="github chunk", metadata={"doc_type": "github"}),
+        Document(page_content="cv chunk", metadata={"doc_type": "CV"}),
+    ] + [
+        Document(
+            page_content=f"paper {i}", metadata={"doc_type": "publications"}
+        )
+        for i in range(20)
+    ]
+    vectorstore = FakeVectorStore(docs)
+    retriever = RoutedRetriever(
+        vectorstore=vectorstore, doc_type_counts=COUNTS, k=10, global_k=3
+    )
+    result = retriever.invoke("Which papers did he publish?")
+    assert vectorstore.calls == [{"doc_type": "publications"}, None]
+    # "paper 0" is in both searches and is not duplicated
+    assert [d.page_content for d in result] == [
+        f"paper {i}" for i in range(8)
+    ] + ["github chunk", "cv chunk"]
+
+
+class FakeCollection:
+    def __init__(self, metadatas):
+        self.metadatas = metadatas
+
+    def count(self):
+        return len(self.metadatas)
+
+    def get(self, include, limit, offset):
+        return {"metadatas": self.metadatas[offset : offset + limit]}
+
+
+class FakeChroma:
+    def __init__(self, metadatas):
+        self._collection = FakeCollection(metadatas)
+
+
+def test_doc_type_index_ignores_chunks_without_doc_type(tmp_path):
+    vectorstore = FakeChroma([{"doc_type": "CV"}, {}, {"doc_type": "CV"}])
+    assert build_doc_type_index(vectorstore, tmp_path) == {"CV": 2}
+    assert load_doc_type_index(vectorstore, tmp_path) == {"CV": 2}
+
+
+def test_load_doc_type_index_is_read_only(tmp_path):
+    vectorstore = FakeChroma([{"doc_type": "CV"}])
+    assert load_doc_type_index(vectorstore, tmp_path) is None
+    assert not (tmp_path / "doc_type_index.json").exists()
+
+    build_doc_type_index(vectorstore, tmp_path)
+    vectorstore._collection.metadatas.append({"doc_type": "github"})
+    assert load_doc_type_index(vectorstore, tmp_path) is None
+    assert ensure_doc_type_index(vectorstore, tmp_path) == {
+        "CV": 1,
+        "github": 1,
+    }
@@ -0,0 +1,107 @@
+import uuid
+import numpy as np
+import pytest
+import chromadb
+from src import visualizer
+from src.visualizer import compute_projection, index_version
+
+
+N_POINTS = 50
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    # Several pages, the last one partial
+    monkeypatch.setattr(visualizer, "PAGE_SIZE", 7)
+
+
+@pytest.fixture
+def collection():
+    """Two well separated clusters: "a" around +10, "b" around -10."""
+    rng = np.random.default_rng(0)
+    ids, embeddings, documents, metadatas = [], [], [], []
+    for i in range(N_POINTS):
+        doc_type = "a" if rng.random() < 0.5 else "b"
+        center = 10.0 if doc_type == "a" else -10.0
+        embeddings.append((center + rng.normal(size=8)).tolist())
+        ids.append(f"chunk-{i}")
+        documents.append(f"{doc_type} chunk {i}")
+        metadatas.append({"doc_type": doc_type})
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"test-{uuid.uuid4().hex}")
+    collection.add(
+        ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+    )
+    return collection
+
+
+def assert_aligned(coords, doc_types, texts):
+    assert len(coords) == len(doc_types) == len(texts)
+    for doc_type, text in zip(doc_types, texts):
+        assert text.startswith(f"Type: {doc_type}<br>Text: {doc_type} chunk")
+    # The first component separates the clusters: every point of a type
+    # must be on the same side
+    signs_a = np.sign(coords[doc_types == "a", 0])
+    signs_b = np.sign(coords[doc_types == "b", 0])
+    assert len(set(signs_a)) == 1
+    assert len(set(signs_b)) == 1
+    assert signs_a[0] != signs_b[0]
+
+
+@pytest.mark.parametrize("method", ["ipca", "pca"])
+@pytest.mark.parametrize("sample", [None, 30])
+def test_projection_lines_up_with_doc_types(collection, method, sample):
+    coords, doc_types, texts = compute_projection(
+        collection, method=method, sample=sample
+    )
+    assert len(coords) == (sample or N_POINTS)
+    assert_aligned(coords, doc_types, texts)
+
+
+def test_second_call_hits_the_cache(collection, tmp_path, monkeypatch):
+    first = compute_projection(collection, sample=30, db_name=str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("projection recomputed")
+
+    monkeypatch.setattr(visualizer, "incremental_projection", fail)
+    second = compute_projection(collection, sample=30, db_name=str(tmp_path))
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_cache_is_pruned_when_the_index_changes(collection, tmp_path):
+    db_name = str(tmp_path)
+    compute_projection(collection, db_name=db_name)
+    old_files = set((tmp_path / "projections").iterdir())
+
+    collection.add(
+        ids=["chunk-new"],
+        embeddings=[[10.0] * 8],
+        documents=["a chunk new"],
+        metadatas=[{"doc_type": "a"}],
+    )
+    compute_projection(collection, db_name=db_name)
+    new_files = set((tmp_path / "projections").iterdir())
+    assert len(new_files) == 1
+    assert not new_files & old_files
+
+
+def test_index_version_uses_ids_without_data_hash(collection, tmp_path):
+    version = index_version(collection, str(tmp_path))
+    collection.delete(ids=["chunk-0"])
+    collection.add(
+        ids=["chunk-other"],
+        embeddings=[[10.0] * 8],
+        documents=["a chunk other"],
+        metadatas=[{"doc_type": "a"}],
+    )
+    # Same size, different content
+    assert index_version(collection, str(tmp_path)) != version
+
+
+def test_empty_collection_is_rejected():
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"test-{uuid.uuid4().hex}")
+    with pytest.raises(ValueError, match="empty"):
+        compute_projection(collection)